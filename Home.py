@@ -16,6 +16,7 @@ st.set_page_config(page_title="semARTagger", page_icon="🏷️", layout="wide")
 
 # --- CONFIG ---
 SCRIPT_NAME = "pipeline.py"
+RETRAIN_SCRIPT_NAME = "retrain.py"
 SESSION_DIR = "sessions"
 os.makedirs(SESSION_DIR, exist_ok=True)
 
@@ -343,6 +344,32 @@ if session_path and "output_ready" in st.session_state:
         else:
             st.sidebar.warning("No edited data to export yet!")
 
+    # --- Feed reviewed tags back into the classifier ---
+    # The model is shared by every session, so the update needs an explicit confirmation.
+    confirm_update = st.sidebar.checkbox(
+        "I want to update the shared classifier (the previous version is backed up)",
+        key="confirm_classifier_update",
+    )
+    if st.sidebar.button("🔁 Update Classifier from Edits", disabled=not confirm_update):
+        if st.session_state.edited_data:
+            pd.DataFrame(st.session_state.edited_data).to_csv(export_filename, index=False)
+            with st.spinner("Updating the classifier from reviewed tags..."):
+                result = subprocess.run(
+                    [sys.executable, RETRAIN_SCRIPT_NAME, export_filename],
+                    capture_output=True,
+                    text=True,
+                )
+            if result.returncode != 0:
+                st.sidebar.error("✕ Error updating the classifier:")
+                st.sidebar.code(result.stderr)
+            else:
+                # retrain.py logs its outcome last, e.g. that these edits were already applied.
+                log_lines = result.stderr.strip().splitlines()
+                outcome = log_lines[-1].split(" — ")[-1] if log_lines else "Classifier updated from reviewed tags!"
+                st.sidebar.success(f"✔︎ {outcome}")
+        else:
+            st.sidebar.warning("No edited data to learn from yet!")
+
     current_row = df.iloc[st.session_state.index]
 
     # --- Artwork Header and Metadata Display (Bigger Font) ---
@@ -0,0 +1,137 @@
+"""Local checks of the tagging server.
+
+The batching and HTTP layers run against a stub tagger on an ephemeral port,
+so they need no models, downloads or outside services. When the pipeline's
+models are installed, `WarmTagger` is also compared with the CSV pipeline on
+a few rows of `example_input.csv`:
+
+    python check_server.py
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+from server import LatencyTracker, MicroBatcher, WarmTagger, make_handler
+
+MAX_BATCH_SIZE = 8
+CONCURRENT_REQUESTS = 16
+PARITY_ROWS = 20
+
+
+class StubTagger:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def tag(self, records):
+        self.batch_sizes.append(len(records))
+        time.sleep(0.02)
+        return [{"Artwork": r["Artwork"], "tags EN": r["Artwork"].upper()} for r in records]
+
+
+def post(base_url, payload):
+    request = Request(f"{base_url}/tag", data=json.dumps(payload).encode("utf-8"), method="POST")
+    with urlopen(request) as response:
+        return json.loads(response.read())["results"]
+
+
+def get(base_url, path):
+    with urlopen(f"{base_url}{path}") as response:
+        return json.loads(response.read())
+
+
+def check_queued_chunks():
+    # Jobs of 1, 8 and 8 records queued together must not share a batch past the limit.
+    stub = StubTagger()
+    batcher = MicroBatcher(stub.tag, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=200)
+    sizes = [1, MAX_BATCH_SIZE, MAX_BATCH_SIZE]
+    submissions = [[{"Artwork": f"queued {n}-{i}"} for i in range(n)] for n in sizes]
+    with ThreadPoolExecutor(len(sizes)) as pool:
+        futures = []
+        for records in submissions:
+            futures.append(pool.submit(batcher.submit, records))
+            time.sleep(0.01)
+        results = [f.result() for f in futures]
+    for records, result in zip(submissions, results):
+        assert [r["Artwork"] for r in result] == [r["Artwork"] for r in records]
+    assert max(stub.batch_sizes) <= MAX_BATCH_SIZE, stub.batch_sizes
+
+
+def check_parity():
+    """Compares WarmTagger with pipeline steps 1–4 and the merge on real models."""
+    try:
+        import pandas as pd
+        import pipeline
+    except (ImportError, OSError) as e:
+        print(f"⏭️ Skipping parity check, pipeline models unavailable: {e}")
+        return
+
+    paths = dict(
+        model_path="labse_logreg_model.pkl",
+        binarizer_path="labse_label_binarizer.pkl",
+        en_terms_path="SUBJECT_all_terms_ENGLISH.csv",
+        nl_terms_path="SUBJECT_all_terms_DUTCH.csv",
+        aat_dict_path="rkd_aat_term_mapping.csv",
+    )
+    if not os.path.exists(paths["model_path"]):
+        print(f"⏭️ Skipping parity check, {paths['model_path']} not found")
+        return
+
+    df = pd.read_csv("example_input.csv").dropna(subset=["Artwork"]).head(PARITY_ROWS)
+    expected = pipeline.step1_predict(df.copy(), paths["model_path"], paths["binarizer_path"])
+    expected = pipeline.step2_embedder_fallback(expected, paths["en_terms_path"], paths["nl_terms_path"])
+    expected = pipeline.step3_ner_tags(expected)
+    expected = pipeline.step4_aat_expansion(expected, paths["aat_dict_path"])
+    expected = pipeline.merge_and_split_tags(expected, paths["en_terms_path"], paths["nl_terms_path"])
+
+    tagger = WarmTagger(**paths)
+    records = df[["Artist Name", "Artwork", "Location"]].fillna("").to_dict(orient="records")
+    actual = tagger.tag(records)
+
+    for (_, want), got in zip(expected.iterrows(), actual):
+        for col in ["tags NL", "tags EN"]:
+            assert want[col] == got[col], (want["Artwork"], col, want[col], got[col])
+    print(f"✅ WarmTagger matches the CSV pipeline on {len(actual)} rows")
+
+
+def main():
+    check_queued_chunks()
+
+    stub = StubTagger()
+    batcher = MicroBatcher(stub.tag, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=50)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batcher, LatencyTracker()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        # Concurrent single-title requests are coalesced, and each caller gets its own slice.
+        titles = [f"title {i}" for i in range(CONCURRENT_REQUESTS)]
+        with ThreadPoolExecutor(CONCURRENT_REQUESTS) as pool:
+            responses = list(pool.map(lambda t: post(base_url, {"title": t}), titles))
+        for title, results in zip(titles, responses):
+            assert results == [{"Artwork": title, "tags EN": title.upper()}], (title, results)
+        assert len(stub.batch_sizes) < CONCURRENT_REQUESTS, stub.batch_sizes
+
+        # An oversized request is split into chunks but returned in order.
+        stub.batch_sizes.clear()
+        many = [f"bulk {i}" for i in range(3 * MAX_BATCH_SIZE + 1)]
+        results = post(base_url, {"titles": many})
+        assert [r["Artwork"] for r in results] == many
+        assert max(stub.batch_sizes) <= MAX_BATCH_SIZE, stub.batch_sizes
+
+        stats = get(base_url, "/stats")
+        assert stats["latency"]["count"] == CONCURRENT_REQUESTS + 1, stats
+        assert stats["latency"]["p50_ms"] is not None and stats["latency"]["p99_ms"] is not None, stats
+        print(f"✅ Server check passed: {json.dumps(stats)}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    check_parity()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+import joblib
+import numpy as np
+
+from pipeline_utils import file_digest
+
+# === CONFIG ===
+COMPACT_MODEL_DIR = "labse_logreg_compact"
+COEF_FILE = "coef.npy"
+INTERCEPT_FILE = "intercept.npy"
+CLASSES_FILE = "classes.npy"
+SOURCE_FILE = "source.json"
+CHECK_SAMPLES = 256
+CHECK_ATOL = 1e-4
+
+
+def sigmoid(z):
+    # Written via logaddexp so that +/-inf intercepts of constant labels map to exactly 1/0.
+    return np.exp(-np.logaddexp(0, -z))
+
+class CompactClassifier:
+    """One-vs-rest logistic regression stored as a stacked weight matrix.
+
+    The arrays are opened with `mmap_mode="r"`, so loading only maps the files
+    and worker processes reading the same artifact share its pages.
+    """
+
+    def __init__(self, coef, intercept, classes):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+
+    @classmethod
+    def load(cls, model_dir, check_source=True):
+        if check_source:
+            stale = stale_sources(model_dir)
+            if stale:
+                raise ValueError(
+                    f"{model_dir} was exported from an older version of {', '.join(stale)}; "
+                    f"re-run compact_model.py"
+                )
+        return cls(
+            np.load(os.path.join(model_dir, COEF_FILE), mmap_mode="r"),
+            np.load(os.path.join(model_dir, INTERCEPT_FILE), mmap_mode="r"),
+            np.load(os.path.join(model_dir, CLASSES_FILE), mmap_mode="r"),
+        )
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=self.coef_.dtype)
+        return sigmoid(X @ self.coef_.T + self.intercept_)
+
+def stack_estimators(clf):
+    n_features = clf.n_features_in_
+    coef = np.zeros((len(clf.estimators_), n_features), dtype=np.float32)
+    intercept = np.zeros(len(clf.estimators_), dtype=np.float32)
+    for i, est in enumerate(clf.estimators_):
+        if hasattr(est, "coef_"):
+            coef[i] = est.coef_.ravel()
+            intercept[i] = est.intercept_[0]
+        else:
+            # Labels that were constant in training predict a fixed probability.
+            p = est.predict_proba(np.zeros((1, n_features)))[0, 1]
+            intercept[i] = np.inf if p >= 1 else -np.inf if p <= 0 else np.log(p / (1 - p))
+    return coef, intercept
+
+def describe_source(path):
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": file_digest(path),
+    }
+
+def stale_sources(model_dir):
+    """Returns the source pickles that changed since `model_dir` was exported from them."""
+    source_path = os.path.join(model_dir, SOURCE_FILE)
+    if not os.path.exists(source_path):
+        logging.warning(f"⚠️ {model_dir} has no {SOURCE_FILE}; cannot check that it is up to date")
+        return []
+    with open(source_path) as f:
+        sources = json.load(f)
+
+    stale = []
+    for source in sources:
+        path = source["path"]
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        # Hashing is only needed when size or mtime moved, which keeps loading cheap.
+        if stat.st_size == source["size"] and stat.st_mtime == source["mtime"]:
+            continue
+        if file_digest(path) != source["sha256"]:
+            stale.append(path)
+    return stale
+
+def export_compact(clf, mlb, model_dir, source_paths=()):
+    coef, intercept = stack_estimators(clf)
+    if coef.shape[0] != len(mlb.classes_):
+        raise ValueError(f"Classifier has {coef.shape[0]} labels but binarizer has {len(mlb.classes_)}")
+
+    os.makedirs(model_dir, exist_ok=True)
+    np.save(os.path.join(model_dir, COEF_FILE), coef)
+    np.save(os.path.join(model_dir, INTERCEPT_FILE), intercept)
+    np.save(os.path.join(model_dir, CLASSES_FILE), np.asarray(mlb.classes_, dtype=str))
+    with open(os.path.join(model_dir, SOURCE_FILE), "w") as f:
+        json.dump([describe_source(p) for p in source_paths], f, indent=2)
+    return CompactClassifier.load(model_dir)
+
+def check_matches(clf, compact, X, atol=CHECK_ATOL):
+    expected = clf.predict_proba(X)
+    actual = compact.predict_proba(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    return max_diff <= atol, max_diff
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s — %(levelname)s — %(message)s")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_path", default="labse_logreg_model.pkl")
+    parser.add_argument("--binarizer_path", default="labse_label_binarizer.pkl")
+    parser.add_argument("--output_dir", default=COMPACT_MODEL_DIR)
+    parser.add_argument("--check_samples", type=int, default=CHECK_SAMPLES)
+
+    args = parser.parse_args()
+
+    clf = joblib.load(args.model_path)
+    mlb = joblib.load(args.binarizer_path)
+    compact = export_compact(clf, mlb, args.output_dir, [args.model_path, args.binarizer_path])
+
+    # LaBSE embeddings are L2-normalised, so unit vectors exercise the same input range.
+    X = np.random.default_rng(0).standard_normal((args.check_samples, clf.n_features_in_))
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    ok, max_diff = check_matches(clf, compact, X)
+    if not ok:
+        logging.error(f"❌ Compact model differs from {args.model_path} (max abs diff {max_diff:.2e})")
+        sys.exit(1)
+    logging.info(f"✅ Exported {len(compact.classes_)} labels to {args.output_dir} (max abs diff {max_diff:.2e})")
+
+if __name__ == "__main__":
+    main()
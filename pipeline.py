@@ -10,6 +10,8 @@ from tqdm import tqdm
 from langdetect import detect
 import sys
 import os
+from compact_model import CompactClassifier
+from pipeline_utils import TITLE_COL, load_aat_map, select_tags
 
 # === Logging setup ===
 logging.basicConfig(
@@ -22,9 +24,6 @@ logging.basicConfig(
 )
 
 # === CONFIG ===
-TITLE_COL = "Artwork"
-CONF_THRESHOLD = 0.25
-MAX_TAGS = 5
 TOP_K = 2
 SIM_THRESHOLD = 0.3
 MIN_COMPONENT_LEN = 4
@@ -44,26 +43,31 @@ def batch_encode(texts, model, batch_size=64):
         embeddings.extend(emb)
     return embeddings
 
-def step1_predict(df, model_path, binarizer_path):
+def load_classifier(model_path, binarizer_path):
+    if os.path.isdir(model_path):
+        # Compact artifacts carry their own class labels, so they stand in for both objects.
+        logging.info("📦 Mapping compact model...")
+        clf = CompactClassifier.load(model_path)
+        return clf, clf
+
     logging.info("📦 Loading model and label binarizer...")
     clf = joblib.load(model_path)
     mlb = joblib.load(binarizer_path)
+    return clf, mlb
 
-    df = df.dropna(subset=[TITLE_COL])
-    titles = df[TITLE_COL].astype(str).tolist()
-    X_test = batch_encode(titles, labse)
-    Y_prob = clf.predict_proba(X_test)
+def predict_tags(X, clf, mlb):
+    Y_prob = clf.predict_proba(X)
     class_labels = mlb.classes_
 
-    predicted_tags = []
-    for probs in Y_prob:
-        tags = [class_labels[idx] for idx, score in enumerate(probs) if score >= CONF_THRESHOLD]
-        if not tags:
-            top_idxs = np.argsort(probs)[-MAX_TAGS:][::-1]
-            tags = [class_labels[i] for i in top_idxs]
-        predicted_tags.append("; ".join(tags))
+    return ["; ".join(select_tags(probs, class_labels)) for probs in Y_prob]
+
+def step1_predict(df, model_path, binarizer_path):
+    clf, mlb = load_classifier(model_path, binarizer_path)
 
-    df["Predicted_Tags"] = predicted_tags
+    df = df.dropna(subset=[TITLE_COL])
+    titles = df[TITLE_COL].astype(str).tolist()
+    X_test = batch_encode(titles, labse)
+    df["Predicted_Tags"] = predict_tags(X_test, clf, mlb)
     return df
 
 def load_terms(en_terms_path, nl_terms_path):
@@ -72,20 +76,22 @@ def load_terms(en_terms_path, nl_terms_path):
     terms = pd.concat([df_en, df_nl])["term"].dropna().astype(str).tolist()
     return list(set(t.strip() for t in terms if len(t.strip()) > 3))
 
-def step2_embedder_fallback(df, en_terms_path, nl_terms_path):
-    terms = load_terms(en_terms_path, nl_terms_path)
-    titles = df[TITLE_COL].astype(str).tolist()
-    term_embeddings = labse.encode(terms, convert_to_tensor=True)
-    title_embeddings = labse.encode(titles, convert_to_tensor=True)
-
+def rank_fallback_tags(title_embeddings, terms, term_embeddings):
     fallback_tags = []
     for i, title_emb in enumerate(title_embeddings):
         sim_scores = util.cos_sim(title_emb, term_embeddings)[0]
         top_idxs = torch.topk(sim_scores, k=TOP_K).indices
         fallback = [terms[idx] for idx in top_idxs if sim_scores[idx] >= SIM_THRESHOLD]
         fallback_tags.append("; ".join(fallback))
+    return fallback_tags
+
+def step2_embedder_fallback(df, en_terms_path, nl_terms_path):
+    terms = load_terms(en_terms_path, nl_terms_path)
+    titles = df[TITLE_COL].astype(str).tolist()
+    term_embeddings = labse.encode(terms, convert_to_tensor=True)
+    title_embeddings = labse.encode(titles, convert_to_tensor=True)
 
-    df["Fallback_Tags"] = fallback_tags
+    df["Fallback_Tags"] = rank_fallback_tags(title_embeddings, terms, term_embeddings)
     return df
 
 def step3_ner_tags(df):
@@ -96,12 +102,7 @@ def step3_ner_tags(df):
     df["NER_Tags"] = ner_tags
     return df
 
-def step4_aat_expansion(df, aat_dict_path):
-    aat_map = pd.read_csv(aat_dict_path)
-    rkd_to_broader = (
-        aat_map.set_index("rkd_term")["broader_terms"]
-        .dropna().str.split("; ").to_dict()
-    )
+def expand_aat_tags(df, rkd_to_broader):
     aat_tags = []
     for _, row in df.iterrows():
         original = []
@@ -115,12 +116,21 @@ def step4_aat_expansion(df, aat_dict_path):
     df["AAT_Expanded_Tags"] = aat_tags
     return df
 
-def merge_and_split_tags(df, en_terms_path, nl_terms_path):
+def step4_aat_expansion(df, aat_dict_path):
+    return expand_aat_tags(df, load_aat_map(aat_dict_path))
+
+def load_vocabularies(en_terms_path, nl_terms_path):
     df_en = pd.read_csv(en_terms_path)
     df_nl = pd.read_csv(nl_terms_path)
     en_terms = set(df_en["term"].dropna().astype(str).str.strip().str.lower())
     nl_terms = set(df_nl["term"].dropna().astype(str).str.strip().str.lower())
+    return en_terms, nl_terms
+
+def merge_and_split_tags(df, en_terms_path, nl_terms_path):
+    en_terms, nl_terms = load_vocabularies(en_terms_path, nl_terms_path)
+    return split_tags_by_language(df, en_terms, nl_terms)
 
+def split_tags_by_language(df, en_terms, nl_terms):
     langs_nl = []
     langs_en = []
 
@@ -0,0 +1,34 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Model-free pieces of the pipeline, kept apart from pipeline.py so that
+# retrain.py can import them without loading LaBSE and the spaCy models.
+
+# === CONFIG ===
+TITLE_COL = "Artwork"
+CONF_THRESHOLD = 0.25
+MAX_TAGS = 5
+
+
+def select_tags(probs, class_labels):
+    tags = [class_labels[idx] for idx, score in enumerate(probs) if score >= CONF_THRESHOLD]
+    if not tags:
+        top_idxs = np.argsort(probs)[-MAX_TAGS:][::-1]
+        tags = [class_labels[i] for i in top_idxs]
+    return tags
+
+def load_aat_map(aat_dict_path):
+    aat_map = pd.read_csv(aat_dict_path)
+    return (
+        aat_map.set_index("rkd_term")["broader_terms"]
+        .dropna().str.split("; ").to_dict()
+    )
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
@@ -0,0 +1,404 @@
+import argparse
+import copy
+import datetime
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import LabelBinarizer, MultiLabelBinarizer
+
+from compact_model import sigmoid
+from pipeline_utils import CONF_THRESHOLD, TITLE_COL, file_digest, load_aat_map, select_tags
+
+# === Logging setup ===
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s — %(levelname)s — %(message)s",
+    handlers=[
+        logging.FileHandler("retrain.log"),
+        logging.StreamHandler()
+    ]
+)
+
+# === CONFIG ===
+ARTIST_COL = "Artist Name"
+TAG_COLS = ["tags NL", "tags EN"]
+# Weight of the penalty ||w - w_baseline||^2 in each label's update. Every run
+# refits from the baseline weights, so the reviewed titles can move a label at
+# most about max ||x|| / ANCHOR_STRENGTH away from it, however often it is run.
+ANCHOR_STRENGTH = 1.0
+N_STEPS = 200
+MIN_PROBE_AGREEMENT = 0.9
+
+
+def split_tags(value):
+    if pd.isna(value):
+        return []
+    return [t.strip() for t in str(value).split(";") if t.strip()]
+
+def load_reviewed(paths):
+    df = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    df = df.dropna(subset=[TITLE_COL])
+    if ARTIST_COL not in df.columns:
+        df[ARTIST_COL] = ""
+    df[ARTIST_COL] = df[ARTIST_COL].fillna("").astype(str)
+    df[TITLE_COL] = df[TITLE_COL].astype(str)
+    df["tags"] = [
+        "; ".join(dict.fromkeys(tag for col in TAG_COLS for tag in split_tags(row.get(col))))
+        for _, row in df.iterrows()
+    ]
+    df = df.drop_duplicates(subset=[ARTIST_COL, TITLE_COL], keep="last")
+    return df[[ARTIST_COL, TITLE_COL, "tags"]].reset_index(drop=True)
+
+def load_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return pd.DataFrame(columns=[ARTIST_COL, TITLE_COL, "tags"]), None
+    data = np.load(cache_path)
+    rows = pd.DataFrame({
+        ARTIST_COL: data["artists"],
+        TITLE_COL: data["titles"],
+        "tags": data["tags"],
+    })
+    return rows, data["embeddings"]
+
+def save_cache(cache_path, rows, embeddings):
+    np.savez(
+        cache_path,
+        artists=rows[ARTIST_COL].to_numpy(dtype=str),
+        titles=rows[TITLE_COL].to_numpy(dtype=str),
+        tags=rows["tags"].to_numpy(dtype=str),
+        embeddings=embeddings.astype(np.float32),
+    )
+
+def update_cache(cached_rows, cached_embeddings, reviewed):
+    known = {}
+    if cached_embeddings is not None:
+        known = dict(zip(cached_rows[TITLE_COL], cached_embeddings))
+
+    missing = [t for t in dict.fromkeys(reviewed[TITLE_COL]) if t not in known]
+    if missing:
+        logging.info(f"🔤 Encoding {len(missing)} new titles...")
+        # Imported lazily: LaBSE and the spaCy models are only needed for uncached titles.
+        from pipeline import batch_encode, labse
+        known.update(zip(missing, np.asarray(batch_encode(missing, labse), dtype=np.float32)))
+
+    rows = pd.concat([cached_rows, reviewed], ignore_index=True)
+    rows = rows.drop_duplicates(subset=[ARTIST_COL, TITLE_COL], keep="last").reset_index(drop=True)
+    if rows.empty:
+        width = cached_embeddings.shape[1] if cached_embeddings is not None else 0
+        return rows, np.empty((0, width), dtype=np.float32)
+    embeddings = np.stack([known[t] for t in rows[TITLE_COL]])
+    return rows, embeddings
+
+def load_subject_terms(en_terms_path, nl_terms_path):
+    terms = pd.concat([pd.read_csv(en_terms_path), pd.read_csv(nl_terms_path)])["term"]
+    terms = terms.dropna().astype(str).str.strip()
+    return {t.lower(): t for t in terms if t}
+
+def select_targets(tags, class_lookup, subject_terms, rkd_to_broader):
+    """Maps one row of reviewed tags onto classifier labels.
+
+    Tags that are already labels are always kept. Any other tag is only a
+    candidate label if it is a subject vocabulary term and not an AAT broader
+    term of another tag on the row: NER entities and AAT expansions come from
+    steps 3 and 4, so step 1 is not trained to predict them.
+    """
+    lowered = [t.lower() for t in tags]
+    derived = {b for t in lowered for b in rkd_to_broader.get(t, [])}
+    targets = []
+    for low in lowered:
+        if low in class_lookup:
+            targets.append(class_lookup[low])
+        elif low in subject_terms and low not in derived:
+            targets.append(subject_terms[low])
+    return list(dict.fromkeys(targets))
+
+def extend_labels(mlb, label_sets):
+    classes = list(mlb.classes_)
+    existing = set(classes)
+
+    # A label seen on every reviewed title has no negatives to learn from.
+    counts = pd.Series([t for tags in label_sets for t in tags], dtype=object).value_counts()
+    new_labels = sorted(t for t, n in counts.items() if t not in existing and n < len(label_sets))
+    skipped = sorted(t for t in counts.index if t not in existing and t not in new_labels)
+    if skipped:
+        logging.warning(f"⚠️ Skipping new labels without negative examples: {', '.join(skipped)}")
+
+    if new_labels:
+        mlb = MultiLabelBinarizer(classes=classes + new_labels).fit([[]])
+    known = set(mlb.classes_)
+    label_sets = [[t for t in tags if t in known] for tags in label_sets]
+    return mlb, label_sets, new_labels
+
+def check_l2_template(clf):
+    if not isinstance(clf, OneVsRestClassifier):
+        raise TypeError(f"Expected a OneVsRestClassifier, got {type(clf).__name__}")
+    template = next((e for e in clf.estimators_ if isinstance(e, LogisticRegression)), None)
+    if template is None:
+        raise TypeError("Classifier has no LogisticRegression estimators to update")
+
+    params = template.get_params()
+    if params.get("penalty") in ("l1", "elasticnet") or (params.get("l1_ratio") or 0) > 0:
+        raise ValueError(
+            f"Anchored updates assume an L2-penalised model, got penalty={params.get('penalty')!r}, "
+            f"l1_ratio={params.get('l1_ratio')!r}"
+        )
+    return template
+
+def anchored_update(W0, b0, X, Y, anchor_strength=ANCHOR_STRENGTH, n_steps=N_STEPS, fit_intercept=True):
+    """Fits logistic regressions on the reviewed rows, pulled towards the baseline weights.
+
+    Minimises, per label, the mean log-loss on `X`, `Y` plus
+    `anchor_strength / 2 * (||w - w0||^2 + (b - b0)^2)` by gradient descent.
+    Unlike a warm-started refit, the optimum stays close to the baseline model
+    instead of forgetting the data it was trained on. `anchor_strength` may be
+    a scalar or one value per label.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    W, b = W0.copy(), b0.copy()
+    n = len(X)
+    lam = np.broadcast_to(np.asarray(anchor_strength, dtype=np.float64), b.shape)
+    # 1 / Lipschitz constant of the gradient keeps the fixed step stable.
+    step = 1.0 / (0.25 * (np.max(np.sum(X ** 2, axis=1)) + 1) + lam.max())
+    for _ in range(n_steps):
+        P = np.exp(-np.logaddexp(0, -(X @ W.T + b)))
+        R = (P - Y) / n
+        W -= step * (R.T @ X + lam[:, np.newaxis] * (W - W0))
+        if fit_intercept:
+            b -= step * (R.sum(axis=0) + lam * (b - b0))
+    return W, b
+
+def model_weights(clf):
+    """Stacks every label's coef_ and intercept_ into one matrix and bias vector."""
+    n_features = clf.n_features_in_
+    W = np.zeros((len(clf.estimators_), n_features))
+    b = np.zeros(len(clf.estimators_))
+    for i, est in enumerate(clf.estimators_):
+        if isinstance(est, LogisticRegression):
+            W[i] = est.coef_.ravel()
+            b[i] = est.intercept_[0]
+        else:
+            # Labels that were constant in training keep their fixed probability.
+            p = np.clip(est.predict_proba(np.zeros((1, n_features)))[0, 1], 1e-4, 1 - 1e-4)
+            b[i] = np.log(p / (1 - p))
+    return W, b
+
+def load_baseline(baseline_path):
+    if not os.path.exists(baseline_path):
+        return None
+    data = np.load(baseline_path)
+    return {
+        "coef": data["coef"],
+        "intercept": data["intercept"],
+        "classes": data["classes"],
+        "model_digest": str(data["model_digest"]),
+        "applied": str(data["applied"]),
+    }
+
+def save_baseline(baseline_path, baseline, model_digest, applied):
+    np.savez(
+        baseline_path,
+        coef=baseline["coef"],
+        intercept=baseline["intercept"],
+        classes=np.asarray(baseline["classes"], dtype=str),
+        model_digest=np.array(model_digest),
+        applied=np.array(applied),
+    )
+
+def training_digest(rows, anchor_strength, n_steps):
+    rows = rows.sort_values([ARTIST_COL, TITLE_COL])
+    payload = rows.to_csv(index=False) + f"{anchor_strength}|{n_steps}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def update_classifier(clf, X, Y, label_idxs, baseline, anchor_strength=ANCHOR_STRENGTH, n_steps=N_STEPS):
+    template = check_l2_template(clf)
+    n_features = X.shape[1]
+    n_base = len(baseline["classes"])
+    estimators = list(clf.estimators_)
+    estimators += [None] * (Y.shape[1] - len(estimators))
+
+    # Labels added after the baseline start from zero weights and the median
+    # baseline bias, i.e. a typical rare label. They have no trained weights to
+    # protect, so they get the model's own L2 strength (1 / C per sample).
+    idxs = np.asarray(label_idxs)
+    is_new = idxs >= n_base
+    W0 = np.zeros((len(idxs), n_features))
+    b0 = np.full(len(idxs), float(np.median(baseline["intercept"])))
+    W0[~is_new] = baseline["coef"][idxs[~is_new]]
+    b0[~is_new] = baseline["intercept"][idxs[~is_new]]
+    lam = np.where(is_new, 1.0 / (template.C * len(X)), anchor_strength)
+    W, b = anchored_update(
+        W0, b0, X, Y[:, idxs], lam, n_steps, template.fit_intercept,
+    )
+
+    for j, idx in enumerate(idxs):
+        current = estimators[idx]
+        if isinstance(current, LogisticRegression):
+            est = copy.deepcopy(current)
+        else:
+            est = clone(template)
+            est.classes_ = np.array([0, 1])
+            est.n_features_in_ = n_features
+            est.n_iter_ = np.array([n_steps])
+        est.coef_ = W[j][np.newaxis, :]
+        est.intercept_ = np.array([b[j]])
+        estimators[idx] = est
+
+    clf = copy.copy(clf)
+    clf.estimators_ = estimators
+    if Y.shape[1] != len(clf.label_binarizer_.classes_):
+        clf.label_binarizer_ = LabelBinarizer(sparse_output=True).fit(np.eye(Y.shape[1], dtype=int))
+    return clf
+
+def tag_sets(probs, classes):
+    return [set(select_tags(row, classes)) for row in probs]
+
+def backup(path, stamp):
+    backup_path = f"{path}.{stamp}.bak"
+    shutil.copy2(path, backup_path)
+    return backup_path
+
+def probe_agreement(old_sets, new_sets):
+    return float(np.mean([len(a & b) / len(a | b) if a | b else 1.0 for a, b in zip(old_sets, new_sets)]))
+
+def retrain(reviewed_paths, model_path, binarizer_path, cache_path, baseline_path, en_terms_path,
+            nl_terms_path, aat_dict_path, probe_path=None, probe_cache_path=None,
+            anchor_strength=ANCHOR_STRENGTH, n_steps=N_STEPS, min_probe_agreement=MIN_PROBE_AGREEMENT):
+    start = time.perf_counter()
+    clf = joblib.load(model_path)
+    mlb = joblib.load(binarizer_path)
+    check_l2_template(clf)
+
+    # Every update is anchored to the model as it was before the first one, so
+    # re-running on the same edits gives the same weights instead of drifting.
+    model_digest = file_digest(model_path)
+    baseline = load_baseline(baseline_path)
+    if baseline is not None and baseline["model_digest"] != model_digest:
+        logging.warning(f"⚠️ {model_path} was replaced outside retrain.py; using it as the new baseline")
+        baseline = None
+    if baseline is None:
+        W_base, b_base = model_weights(clf)
+        baseline = {"coef": W_base, "intercept": b_base, "classes": mlb.classes_, "applied": ""}
+    W_base, b_base = baseline["coef"], baseline["intercept"]
+    n_base = len(baseline["classes"])
+
+    reviewed = load_reviewed(reviewed_paths)
+    rows, X = update_cache(*load_cache(cache_path), reviewed)
+    save_cache(cache_path, rows, X)
+    if rows.empty:
+        logging.info("✅ No reviewed titles to learn from; nothing to update")
+        return clf, mlb
+
+    digest = training_digest(rows, anchor_strength, n_steps)
+    if digest == baseline["applied"]:
+        logging.info("✅ These reviewed tags are already applied; nothing to update")
+        return clf, mlb
+
+    class_lookup = {str(c).lower(): c for c in mlb.classes_}
+    subject_terms = load_subject_terms(en_terms_path, nl_terms_path)
+    rkd_to_broader = load_aat_map(aat_dict_path)
+    label_sets = [
+        select_targets(split_tags(t), class_lookup, subject_terms, rkd_to_broader)
+        for t in rows["tags"]
+    ]
+    mlb, label_sets, new_labels = extend_labels(mlb, label_sets)
+    Y = mlb.transform(label_sets)
+
+    # Refit labels whose baseline prediction disagrees with a reviewed title,
+    # labels an earlier run already moved, and labels added since the baseline.
+    base_probs = sigmoid(X @ W_base.T + b_base)
+    disagree = ((base_probs >= CONF_THRESHOLD) != Y[:, :n_base].astype(bool)).any(axis=0)
+    W_cur, b_cur = model_weights(clf)
+    moved = (W_cur[:n_base] != W_base).any(axis=1) | (b_cur[:n_base] != b_base)
+    label_idxs = sorted(set(np.flatnonzero(disagree | moved)) | set(range(n_base, Y.shape[1])))
+    if not label_idxs:
+        save_baseline(baseline_path, baseline, model_digest, digest)
+        logging.info("✅ Classifier already agrees with the reviewed tags; nothing to update")
+        return clf, mlb
+
+    new_clf = update_classifier(clf, X, Y, label_idxs, baseline, anchor_strength, n_steps)
+
+    # Predictions on titles nobody reviewed should stay close to the baseline's.
+    P = np.empty((0, X.shape[1]))
+    if probe_path and os.path.exists(probe_path):
+        probes = load_reviewed([probe_path])
+        probes = probes[~probes[TITLE_COL].isin(rows[TITLE_COL])].reset_index(drop=True)
+        if not probes.empty:
+            probe_rows, P = update_cache(*load_cache(probe_cache_path), probes)
+            save_cache(probe_cache_path, probe_rows, P)
+            P = P[probe_rows[TITLE_COL].isin(probes[TITLE_COL]).to_numpy()]
+
+    if len(P):
+        # Compared on the baseline labels only; new labels firing is the point of the update.
+        new_probs = new_clf.predict_proba(P)
+        old_sets = tag_sets(sigmoid(P @ W_base.T + b_base), baseline["classes"])
+        new_sets = tag_sets(new_probs[:, :n_base], baseline["classes"])
+        agreement = probe_agreement(old_sets, new_sets)
+        logging.info(
+            f"🔎 Probe agreement on {len(P)} unreviewed titles: {agreement:.3f} "
+            f"(tags per title {np.mean([len(s) for s in old_sets]):.2f} → "
+            f"{np.mean([len(s) for s in new_sets]):.2f}, "
+            f"new labels on {np.mean((new_probs[:, n_base:] >= CONF_THRESHOLD).any(axis=1)):.0%})"
+        )
+        if agreement < min_probe_agreement:
+            raise ValueError(
+                f"Update changed predictions on unreviewed titles too much "
+                f"(agreement {agreement:.3f} < {min_probe_agreement}); nothing was saved. "
+                f"Try a larger --anchor_strength."
+            )
+    else:
+        logging.warning("⚠️ No unreviewed probe titles available; skipping the check on unreviewed titles")
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    for path in [model_path, binarizer_path]:
+        logging.info(f"💾 Previous version kept as {backup(path, stamp)}")
+    joblib.dump(new_clf, model_path)
+    joblib.dump(mlb, binarizer_path)
+    save_baseline(baseline_path, baseline, file_digest(model_path), digest)
+
+    logging.info(
+        f"✅ Updated {len(label_idxs)} labels ({len(new_labels)} new) from {len(rows)} reviewed titles "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return new_clf, mlb
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("reviewed_files", nargs="+")
+    parser.add_argument("--model_path", default="labse_logreg_model.pkl")
+    parser.add_argument("--binarizer_path", default="labse_label_binarizer.pkl")
+    parser.add_argument("--cache_path", default="reviewed_embeddings.npz")
+    parser.add_argument("--baseline_path", default="reviewed_baseline.npz")
+    parser.add_argument("--en_terms_path", default="SUBJECT_all_terms_ENGLISH.csv")
+    parser.add_argument("--nl_terms_path", default="SUBJECT_all_terms_DUTCH.csv")
+    parser.add_argument("--aat_dict_path", default="rkd_aat_term_mapping.csv")
+    parser.add_argument("--probe_file", default="example_input.csv")
+    parser.add_argument("--probe_cache_path", default="probe_embeddings.npz")
+    parser.add_argument("--anchor_strength", type=float, default=ANCHOR_STRENGTH)
+    parser.add_argument("--steps", type=int, default=N_STEPS)
+    parser.add_argument("--min_probe_agreement", type=float, default=MIN_PROBE_AGREEMENT)
+
+    args = parser.parse_args()
+
+    try:
+        retrain(
+            args.reviewed_files, args.model_path, args.binarizer_path, args.cache_path,
+            args.baseline_path, args.en_terms_path, args.nl_terms_path, args.aat_dict_path,
+            args.probe_file, args.probe_cache_path,
+            args.anchor_strength, args.steps, args.min_probe_agreement,
+        )
+    except Exception as e:
+        logging.error(f"❌ Retraining failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# === CONFIG ===
+TITLE_COL = "Artwork"
+HOST = "127.0.0.1"
+PORT = 8502
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 10
+LATENCY_WINDOW = 10000
+OUTPUT_COLS = ["Artist Name", "Artwork", "Location", "tags NL", "tags EN"]
+
+
+class WarmTagger:
+    """Runs pipeline steps 1–4 plus the merge with every model and vocabulary kept in memory."""
+
+    def __init__(self, model_path, binarizer_path, en_terms_path, nl_terms_path, aat_dict_path,
+                 batch_size=MAX_BATCH_SIZE):
+        # Imported here so the batching and HTTP layers load without LaBSE or spaCy.
+        import pipeline
+
+        self.batch_size = batch_size
+        self.clf, self.mlb = pipeline.load_classifier(model_path, binarizer_path)
+        logging.info("📚 Encoding subject vocabulary...")
+        self.terms = pipeline.load_terms(en_terms_path, nl_terms_path)
+        self.term_embeddings = pipeline.labse.encode(self.terms, convert_to_tensor=True)
+        self.rkd_to_broader = pipeline.load_aat_map(aat_dict_path)
+        self.en_terms, self.nl_terms = pipeline.load_vocabularies(en_terms_path, nl_terms_path)
+
+    def tag(self, records):
+        import pandas as pd
+        import torch
+        import pipeline
+
+        df = pd.DataFrame(records, columns=["Artist Name", TITLE_COL, "Location"]).fillna("")
+        titles = df[TITLE_COL].astype(str).tolist()
+
+        # One LaBSE pass feeds both the classifier and the vocabulary fallback.
+        X = pipeline.labse.encode(titles, batch_size=self.batch_size)
+        df["Predicted_Tags"] = pipeline.predict_tags(X, self.clf, self.mlb)
+        df["Fallback_Tags"] = pipeline.rank_fallback_tags(
+            torch.from_numpy(np.asarray(X)).to(self.term_embeddings.device),
+            self.terms,
+            self.term_embeddings,
+        )
+        df = pipeline.step3_ner_tags(df)
+        df = pipeline.expand_aat_tags(df, self.rkd_to_broader)
+        df = pipeline.split_tags_by_language(df, self.en_terms, self.nl_terms)
+        return df[OUTPUT_COLS].to_dict(orient="records")
+
+
+class _Job:
+    def __init__(self, records):
+        self.records = records
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces concurrent submissions into one call of `handler`.
+
+    A batch is flushed once it holds `max_batch_size` records or `max_wait_ms`
+    has passed since its first job arrived, whichever comes first. Larger
+    submissions are queued as several chunks so they cannot hold up other callers.
+    """
+
+    def __init__(self, handler, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.batched_records = 0
+        self._queue = queue.Queue()
+        self._held = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, records):
+        jobs = [
+            _Job(records[i:i + self.max_batch_size])
+            for i in range(0, len(records), self.max_batch_size)
+        ]
+        for job in jobs:
+            self._queue.put(job)
+
+        results = []
+        for job in jobs:
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+            results.extend(job.result)
+        return results
+
+    def _collect(self):
+        if self._held is not None:
+            jobs, self._held = [self._held], None
+        else:
+            jobs = [self._queue.get()]
+        size = len(jobs[0].records)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if size + len(job.records) > self.max_batch_size:
+                # Would overflow this batch, so it opens the next one instead.
+                self._held = job
+                break
+            jobs.append(job)
+            size += len(job.records)
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            records = [r for job in jobs for r in job.records]
+            try:
+                results = self.handler(records)
+            except Exception as e:
+                logging.error(f"❌ Batch of {len(records)} failed: {e}")
+                for job in jobs:
+                    job.error = e
+                    job.done.set()
+                continue
+
+            self.batches += 1
+            self.batched_records += len(records)
+            offset = 0
+            for job in jobs:
+                job.result = results[offset:offset + len(job.records)]
+                offset += len(job.records)
+                job.done.set()
+
+    def stats(self):
+        mean = self.batched_records / self.batches if self.batches else 0.0
+        return {"batches": self.batches, "mean_batch_size": round(mean, 2)}
+
+
+class LatencyTracker:
+    """Keeps the most recent request latencies and reports percentiles in milliseconds."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds * 1000.0)
+
+    def summary(self):
+        with self._lock:
+            samples = np.array(self._samples)
+        if not len(samples):
+            return {"count": 0, "p50_ms": None, "p99_ms": None}
+        return {
+            "count": len(samples),
+            "p50_ms": round(float(np.percentile(samples, 50)), 2),
+            "p99_ms": round(float(np.percentile(samples, 99)), 2),
+        }
+
+
+def parse_records(payload):
+    """Accepts {"title": ...} or {"titles": [...]}; list items may be strings or row objects."""
+    if "title" in payload:
+        items = [payload["title"]]
+    elif "titles" in payload:
+        items = payload["titles"]
+    else:
+        raise ValueError('Request body needs a "title" or "titles" field')
+    if not isinstance(items, list) or not items:
+        raise ValueError('"titles" must be a non-empty list')
+
+    records = []
+    for item in items:
+        if isinstance(item, str):
+            item = {TITLE_COL: item}
+        if not isinstance(item, dict) or not str(item.get(TITLE_COL, "")).strip():
+            raise ValueError(f'Every entry needs a non-empty "{TITLE_COL}"')
+        records.append({col: item.get(col, "") for col in ["Artist Name", TITLE_COL, "Location"]})
+    return records
+
+
+def make_handler(batcher, latencies):
+    class TaggingHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self._send_json(200, {"latency": latencies.summary(), "batching": batcher.stats()})
+            else:
+                self._send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/tag":
+                self._send_json(404, {"error": "Not found"})
+                return
+
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                records = parse_records(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            try:
+                results = batcher.submit(records)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            latencies.record(time.perf_counter() - start)
+            self._send_json(200, {"results": results})
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return TaggingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max_batch_size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max_wait_ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--model_path", default="labse_logreg_model.pkl")
+    parser.add_argument("--binarizer_path", default="labse_label_binarizer.pkl")
+    parser.add_argument("--en_terms_path", default="SUBJECT_all_terms_ENGLISH.csv")
+    parser.add_argument("--nl_terms_path", default="SUBJECT_all_terms_DUTCH.csv")
+    parser.add_argument("--aat_dict_path", default="rkd_aat_term_mapping.csv")
+
+    args = parser.parse_args()
+
+    tagger = WarmTagger(
+        args.model_path, args.binarizer_path,
+        args.en_terms_path, args.nl_terms_path, args.aat_dict_path,
+        args.max_batch_size,
+    )
+    batcher = MicroBatcher(tagger.tag, args.max_batch_size, args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher, LatencyTracker()))
+
+    logging.info(f"✅ Tagging server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()